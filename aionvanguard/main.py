@@ -1,40 +1,79 @@
 import streamlit as st
 import pandas as pd
-import alpaca_trade_api as tradeapi
-import finnhub
+import numpy as np
 import os
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Environment Variables & API Initialization ---
 ALPACA_API_KEY_ID = os.getenv("ALPACA_API_KEY_ID")
 ALPACA_API_SECRET_KEY = os.getenv("ALPACA_API_SECRET_KEY")
 FINNHUB_API_KEY = os.getenv("FINNHUB_API_KEY")
 
-# Alpaca API
-api = tradeapi.REST(ALPACA_API_KEY_ID, ALPACA_API_SECRET_KEY, base_url='https://paper-api.alpaca.markets')
+# API clients are cached as resources so reruns reuse their HTTP sessions.
+# The SDKs are imported on first use so the dashboard renders before they load.
+@st.cache_resource(show_spinner=False)
+def get_api():
+    """Returns the shared Alpaca API client."""
+    import alpaca_trade_api as tradeapi
 
-# Finnhub API
-finnhub_client = finnhub.Client(api_key=FINNHUB_API_KEY)
+    return tradeapi.REST(ALPACA_API_KEY_ID, ALPACA_API_SECRET_KEY, base_url='https://paper-api.alpaca.markets')
+
+@st.cache_resource(show_spinner=False)
+def get_finnhub_client():
+    """Returns the shared Finnhub API client."""
+    import finnhub
+
+    return finnhub.Client(api_key=FINNHUB_API_KEY)
+
+# Seconds between trading cycles while the agent is running
+TRADING_INTERVAL_SECONDS = 60
+
+# Tolerance for the refresh timer firing slightly before a full interval has passed
+CYCLE_TIMER_SLACK_SECONDS = 5
+
+# Upper bound on concurrent candle requests per trading cycle
+MAX_FETCH_WORKERS = 8
+
+# Moving average windows used by the crossover signal
+SHORT_WINDOW = 20
+LONG_WINDOW = 50
+
+# Stop loss placed 2% against the entry price for each signal side
+STOP_LOSS_MULTIPLIERS = {"BUY": 0.98, "SELL": 1.02}
+
+# Number of most recent log lines kept and shown in the activity log
+MAX_LOG_LINES = 30
 
 # --- Trading Logic ---
-def fetch_historical_data(symbol, resolution, from_ts, to_ts):
+def fetch_historical_data(client, symbol, resolution, from_ts, to_ts):
     """Fetches historical data from Finnhub."""
-    return finnhub_client.stock_candles(symbol, resolution, from_ts, to_ts)
+    return client.stock_candles(symbol, resolution, from_ts, to_ts)
+
+def parse_symbols(raw_symbols):
+    """Parses the comma-separated symbols input into a tuple of unique tickers."""
+    return tuple(dict.fromkeys(filter(None, (s.strip().upper() for s in raw_symbols.split(',')))))
 
 def generate_signal(close_prices):
     """Generates a trading signal based on a simple moving average crossover."""
-    if len(close_prices) < 50:
+    if len(close_prices) < LONG_WINDOW:
         return "HOLD"
 
-    short_sma = pd.Series(close_prices).rolling(window=20).mean().iloc[-1]
-    long_sma = pd.Series(close_prices).rolling(window=50).mean().iloc[-1]
+    # Only the latest value of each SMA is needed, so average the tails directly.
+    # The short window is the tail of the long one, so its sum is shared.
+    closes = np.asarray(close_prices[-LONG_WINDOW:], dtype=np.float64)
+    short_sum = closes[-SHORT_WINDOW:].sum()
+    short_sma = short_sum / SHORT_WINDOW
+    long_sma = (closes[:-SHORT_WINDOW].sum() + short_sum) / LONG_WINDOW
 
-    if short_sma > long_sma:
+    # The two averages round differently, so flat prices must not read as a crossover
+    if np.isclose(short_sma, long_sma):
+        return "HOLD"
+    elif short_sma > long_sma:
         return "BUY"
-    elif short_sma < long_sma:
-        return "SELL"
     else:
-        return "HOLD"
+        return "SELL"
 
 def calculate_position_size(entry_price, stop_loss_price, account_balance, risk_per_trade):
     """Calculates the position size for a trade."""
@@ -44,7 +83,7 @@ def calculate_position_size(entry_price, stop_loss_price, account_balance, risk_
 
 def place_order(symbol, qty, side, order_type, time_in_force):
     """Places an order with Alpaca."""
-    api.submit_order(
+    get_api().submit_order(
         symbol=symbol,
         qty=qty,
         side=side,
@@ -66,60 +105,72 @@ time_based_exit = st.sidebar.slider("Time-based Exit (minutes)", 1, 60, 5, 1)
 start_button = st.sidebar.button("Start Agent")
 stop_button = st.sidebar.button("Stop Agent")
 
-# --- Dashboard ---
-log_container = st.container()
-log_container.header("Activity Log")
-log_area = log_container.empty()
-
-position_container = st.container()
-position_container.header("Open Positions")
-position_area = position_container.empty()
-
 if 'logs' not in st.session_state:
-    st.session_state.logs = []
+    st.session_state.logs = deque(maxlen=MAX_LOG_LINES)
 if 'positions' not in st.session_state:
     st.session_state.positions = []
 if 'agent_running' not in st.session_state:
     st.session_state.agent_running = False
+if 'last_cycle_at' not in st.session_state:
+    st.session_state.last_cycle_at = None
 
 def run_trading_loop():
     """The main trading loop for the agent."""
     if not st.session_state.agent_running:
         return
 
-    for symbol in symbols.split(','):
-        try:
-            # Fetch data
-            now = int(pd.Timestamp.now().timestamp())
-            then = int((pd.Timestamp.now() - pd.Timedelta(days=60)).timestamp())
-            candles = fetch_historical_data(symbol, "D", then, now)
-
-            # Generate signal
-            signal = generate_signal(candles['c'])
-            st.session_state.logs.append(f"[{symbol}] Signal: {signal}")
-
-            if signal != "HOLD":
-                # Get account info and calculate position size
-                account = api.get_account()
-                balance = float(account.equity)
-                entry_price = candles['c'][-1]
-                stop_loss_price = entry_price * (1 - 0.02) if signal == "BUY" else entry_price * (1 + 0.02)
-                position_size = calculate_position_size(entry_price, stop_loss_price, balance, risk_per_trade)
-
-                # Place order
-                place_order(symbol, position_size, signal.lower(), 'market', 'gtc')
-                st.session_state.logs.append(f"[{symbol}] Placed {signal} order for {position_size} shares.")
-
-        except Exception as e:
-            st.session_state.logs.append(f"[{symbol}] Error: {e}")
+    # UI interactions rerun the dashboard too; only trade once per interval
+    last_cycle_at = st.session_state.last_cycle_at
+    if last_cycle_at is not None and time.monotonic() - last_cycle_at < TRADING_INTERVAL_SECONDS - CYCLE_TIMER_SLACK_SECONDS:
+        return
+    st.session_state.last_cycle_at = time.monotonic()
+
+    symbol_list = parse_symbols(symbols)
+    now_ts = pd.Timestamp.now()
+    now = int(now_ts.timestamp())
+    then = int((now_ts - pd.Timedelta(days=60)).timestamp())
+
+    # Candle requests are network-bound, so issue them for all symbols up front.
+    # The client is resolved here so the workers only make plain HTTP calls.
+    try:
+        finnhub_client = get_finnhub_client()
+    except Exception as e:
+        st.session_state.logs.append(f"[finnhub] Error: {e}")
+        return
+    balance = None
+    with ThreadPoolExecutor(max_workers=max(1, min(len(symbol_list), MAX_FETCH_WORKERS))) as pool:
+        candle_futures = {symbol: pool.submit(fetch_historical_data, finnhub_client, symbol, "D", then, now) for symbol in symbol_list}
+
+        for symbol in symbol_list:
+            try:
+                # Fetch data
+                candles = candle_futures[symbol].result()
+
+                # Generate signal
+                signal = generate_signal(candles['c'])
+                st.session_state.logs.append(f"[{symbol}] Signal: {signal}")
+
+                if signal != "HOLD":
+                    # Get account info once per cycle and calculate position size
+                    if balance is None:
+                        balance = float(get_api().get_account().equity)
+                    entry_price = candles['c'][-1]
+                    stop_loss_price = entry_price * STOP_LOSS_MULTIPLIERS[signal]
+                    position_size = calculate_position_size(entry_price, stop_loss_price, balance, risk_per_trade)
+
+                    # Place order
+                    place_order(symbol, position_size, signal.lower(), 'market', 'gtc')
+                    st.session_state.logs.append(f"[{symbol}] Placed {signal} order for {position_size} shares.")
+
+            except Exception as e:
+                st.session_state.logs.append(f"[{symbol}] Error: {e}")
 
     # Update positions
-    positions = api.list_positions()
-    st.session_state.positions = [{"symbol": p.symbol, "qty": p.qty, "side": p.side, "avg_entry_price": p.avg_entry_price} for p in positions]
-
-    # Rerun the script to update the UI
-    time.sleep(60)
-    st.rerun()
+    try:
+        positions = get_api().list_positions()
+        st.session_state.positions = [{"symbol": p.symbol, "qty": p.qty, "side": p.side, "avg_entry_price": p.avg_entry_price} for p in positions]
+    except Exception as e:
+        st.session_state.logs.append(f"[positions] Error: {e}")
 
 if start_button:
     st.session_state.agent_running = True
@@ -129,8 +180,17 @@ if stop_button:
     st.session_state.agent_running = False
     st.session_state.logs.append("Agent stopped.")
 
-log_area.text_area("Logs", "\n".join(st.session_state.logs), height=300)
-position_area.dataframe(st.session_state.positions)
-
-if st.session_state.agent_running:
+# --- Dashboard ---
+# Only this fragment reruns on the trading interval; the sidebar is left untouched
+@st.fragment(run_every=TRADING_INTERVAL_SECONDS if st.session_state.agent_running else None)
+def live_dashboard():
+    """Runs a trading cycle while the agent is active and renders its activity."""
     run_trading_loop()
+
+    st.header("Activity Log")
+    st.code("\n".join(st.session_state.logs), language=None)
+
+    st.header("Open Positions")
+    st.dataframe(st.session_state.positions, hide_index=True)
+
+live_dashboard()